@@ -0,0 +1,207 @@
+import hashlib
+import mimetypes
+import os
+import uuid
+import zlib
+
+DEFAULT_CHUNK_SIZE = 255 * 1024
+
+# Formats whose payload is already compressed; zlib would only burn CPU on them
+PRECOMPRESSED_CONTENT_TYPES = (
+    "image/", "video/", "audio/",
+    "application/zip", "application/gzip", "application/x-gzip", "application/x-bzip2",
+    "application/x-xz", "application/x-7z-compressed", "application/vnd.rar", "application/x-rar-compressed",
+    "application/zstd", "application/pdf", "application/vnd.openxmlformats-officedocument",
+    "application/vnd.oasis.opendocument", "application/epub+zip", "application/java-archive",
+)
+# Content types that say nothing about the format, so the extension is consulted instead
+GENERIC_CONTENT_TYPES = ("", "application/octet-stream", "binary/octet-stream")
+PRECOMPRESSED_MAGIC = (
+    b"PK\x03\x04", b"\x1f\x8b", b"BZh", b"\xfd7zXZ\x00", b"7z\xbc\xaf\x27\x1c", b"Rar!",
+    b"\x28\xb5\x2f\xfd", b"%PDF", b"\x89PNG", b"\xff\xd8\xff", b"GIF8", b"RIFF", b"OggS",
+    b"fLaC", b"ID3",
+)
+
+
+class AttachmentStore:
+    """Blob store for task attachments that moves data in fixed-size chunks.
+
+    put() consumes a readable file-like object chunk by chunk and open() yields the
+    stored bytes chunk by chunk, so neither side needs the whole file in memory.
+    """
+
+    name = None
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def put(self, source, filename):
+        """Store everything readable from source; returns (file_id, length)"""
+        raise NotImplementedError
+
+    def open(self, file_id):
+        """Iterate over the stored bytes of file_id in chunks"""
+        raise NotImplementedError
+
+    def delete(self, file_id):
+        raise NotImplementedError
+
+    def _chunks(self, source):
+        while True:
+            chunk = source.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class GridFSAttachmentStore(AttachmentStore):
+    """Attachments kept in MongoDB GridFS, split into chunk_size documents"""
+
+    name = "gridfs"
+
+    def __init__(self, database, bucket_name="attachments", chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(chunk_size)
+        import gridfs
+        self.bucket = gridfs.GridFSBucket(database, bucket_name=bucket_name, chunk_size_bytes=chunk_size)
+
+    def put(self, source, filename):
+        with self.bucket.open_upload_stream(filename) as grid_in:
+            for chunk in self._chunks(source):
+                grid_in.write(chunk)
+        return grid_in._id, grid_in.length
+
+    def open(self, file_id):
+        grid_out = self.bucket.open_download_stream(file_id)
+        try:
+            yield from self._chunks(grid_out)
+        finally:
+            grid_out.close()
+
+    def delete(self, file_id):
+        import gridfs
+        try:
+            self.bucket.delete(file_id)
+        except gridfs.errors.NoFile:
+            pass
+
+
+class LocalAttachmentStore(AttachmentStore):
+    """Attachments kept as files under a local directory, handy for tests and single-host setups"""
+
+    name = "local"
+
+    def __init__(self, root, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, file_id):
+        return os.path.join(self.root, file_id)
+
+    def put(self, source, filename):
+        file_id = uuid.uuid4().hex
+        length = 0
+        with open(self._path(file_id), "wb") as target:
+            for chunk in self._chunks(source):
+                target.write(chunk)
+                length += len(chunk)
+        return file_id, length
+
+    def open(self, file_id):
+        with open(self._path(file_id), "rb") as source:
+            yield from self._chunks(source)
+
+    def delete(self, file_id):
+        try:
+            os.remove(self._path(file_id))
+        except FileNotFoundError:
+            pass
+
+
+class HashingReader:
+    """File-like wrapper that counts and SHA-256 hashes bytes as they are read through it"""
+
+    def __init__(self, source):
+        self.source = source
+        self.length = 0
+        self._sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        chunk = self.source.read(size)
+        self.length += len(chunk)
+        self._sha256.update(chunk)
+        return chunk
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+
+class PrefixedReader:
+    """File-like object that yields bytes already read from a source before the rest of it"""
+
+    def __init__(self, prefix, source):
+        self.prefix = prefix
+        self.source = source
+
+    def read(self, size=-1):
+        if not self.prefix:
+            return self.source.read(size)
+        if size < 0:
+            data, self.prefix = self.prefix + self.source.read(), b""
+            return data
+        data, self.prefix = self.prefix[:size], self.prefix[size:]
+        return data
+
+
+def is_precompressed(filename, content_type=None, head=b""):
+    """Guess from the content type, extension or leading bytes whether data is already compressed"""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in GENERIC_CONTENT_TYPES:
+        content_type = mimetypes.guess_type(filename or "")[0] or ""
+    if content_type.startswith(PRECOMPRESSED_CONTENT_TYPES):
+        return True
+    return head.startswith(PRECOMPRESSED_MAGIC)
+
+
+class CompressingReader:
+    """File-like wrapper that zlib-compresses a source as it is read"""
+
+    codec = "zlib"
+
+    def __init__(self, source, level=6, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.source = source
+        self.chunk_size = chunk_size
+        self._compressor = zlib.compressobj(level)
+        self._buffer = bytearray()
+        self._eof = False
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self.source.read(self.chunk_size)
+            if chunk:
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._eof = True
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+def decompress_chunks(chunks, codec):
+    """Undo CompressingReader over an iterator of stored chunks"""
+    if not codec:
+        yield from chunks
+        return
+    if codec != CompressingReader.codec:
+        raise ValueError(f"Unknown attachment codec: {codec}")
+    decompressor = zlib.decompressobj()
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    tail = decompressor.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,185 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class LruCache:
+    """Thread-safe LRU shared by all sessions of the process, bounded by the total weight of its entries.
+
+    Every entry belongs to groups (a task, a table) that are invalidated together.
+    Invalidating a group bumps its version; a put given the versions read before its
+    value was computed is skipped if any of them has moved since, so a reader racing
+    a writer cannot store a value the writer just made stale.
+    """
+
+    # Versions kept before they are reset under a new epoch
+    max_versions = 10000
+    # Returned by lookups that find nothing. Compare against cache.MISS: the app module
+    # is executed afresh on every rerun, while the cache object outlives it
+    MISS = object()
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.weight = 0
+        self._entries = OrderedDict()  # key -> (value, groups, weight, stored_at)
+        self._keys_by_group = {}
+        self._versions = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def versions(self, groups):
+        with self._lock:
+            return self._current_versions(groups)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_group.clear()
+            # Values being computed right now were read before the clear
+            self._epoch += 1
+            self.weight = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _current_versions(self, groups):
+        return (self._epoch,) + tuple(self._versions.get(group, 0) for group in groups)
+
+    def _get(self, key, max_age=None):
+        """Value stored under key, or MISS; counted as a hit or a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and max_age is not None and time.monotonic() - entry[3] > max_age:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return self.MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _put(self, key, value, groups, versions=None, weight=1):
+        with self._lock:
+            # A write landed while the value was computed: it may already be stale
+            if versions is not None and self._current_versions(groups) != versions:
+                return
+            if key in self._entries:
+                self._drop(key)
+            if weight > self.capacity:
+                return
+            self._entries[key] = (value, groups, weight, time.monotonic())
+            self.weight += weight
+            for group in groups:
+                self._keys_by_group.setdefault(group, set()).add(key)
+            while self.weight > self.capacity:
+                self._drop(next(iter(self._entries)))
+
+    def _invalidate(self, *groups):
+        """Drop every entry of the groups and bump their versions"""
+        with self._lock:
+            if len(self._versions) + len(groups) > self.max_versions:
+                self._versions.clear()
+                self._epoch += 1
+            for group in groups:
+                self._versions[group] = self._versions.get(group, 0) + 1
+                for key in list(self._keys_by_group.get(group, ())):
+                    self._drop(key)
+
+    def _stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _drop(self, key):
+        _, groups, weight, _ = self._entries.pop(key)
+        self.weight -= weight
+        for group in groups:
+            keys = self._keys_by_group.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_group[group]
+
+
+PERMISSION_CACHE_SIZE = 10000
+
+
+class PermissionCache(LruCache):
+    """Bounded LRU of permission levels keyed by (task_id, user_id), shared by all sessions"""
+
+    def __init__(self, maxsize=PERMISSION_CACHE_SIZE):
+        super().__init__(maxsize)
+        self.maxsize = maxsize
+
+    def get(self, task_id, user_id):
+        value = self._get((task_id, user_id))
+        return None if value is self.MISS else value
+
+    def versions(self, task_id, user_id):
+        """Versions to hand to put() for a level about to be read from the database"""
+        return super().versions((task_id, (task_id, user_id)))
+
+    def put(self, task_id, user_id, permission_level, versions=None):
+        """Cache a level, unless it was invalidated after versions were taken"""
+        self._put((task_id, user_id), permission_level, (task_id, (task_id, user_id)), versions)
+
+    def invalidate(self, task_id, user_id):
+        """Drop the cached permission of one user on one task"""
+        self._invalidate((task_id, user_id))
+
+    def invalidate_task(self, task_id):
+        """Drop every cached permission on a task"""
+        self._invalidate(task_id)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats(), "maxsize": self.maxsize}
+
+
+QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Bounds staleness from writes made by other processes, which cannot bump our versions
+QUERY_CACHE_TTL = 5 * 60
+
+
+class QueryCache(LruCache):
+    """Byte-bounded LRU of query results shared by all sessions of the process.
+
+    Entries are keyed by the query, its arguments and the current version of every
+    table it reads. Writers bump those versions, so a stale entry is never looked up
+    again; it is also dropped right away to free its memory. Values are stored
+    pickled, which gives every hit its own copy and an exact size.
+    """
+
+    def __init__(self, max_bytes=QUERY_CACHE_MAX_BYTES, ttl=QUERY_CACHE_TTL):
+        super().__init__(max_bytes)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def get(self, key):
+        """Unpickled value stored under key, or MISS"""
+        payload = self._get(key, max_age=self.ttl)
+        return payload if payload is self.MISS else pickle.loads(payload)
+
+    def put(self, key, tables, versions, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._put(key, payload, tables, versions, weight=len(payload))
+
+    def bump(self, *tables):
+        """Record a write to the tables, invalidating every entry that read them"""
+        self._invalidate(*tables)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats(),
+                "bytes": self.weight,
+                "max_bytes": self.max_bytes,
+                "versions": dict(self._versions),
+            }
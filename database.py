@@ -1,8 +1,11 @@
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, Enum, ForeignKey, Float
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, Enum, ForeignKey, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import enum
+import sys
+
+from models import collapse_duplicate_keys, ensure_schema
 
 Base = declarative_base()
 
@@ -65,6 +68,14 @@ class Task(Base):
 
 class Dashboard(Base):
     __tablename__ = 'dashboard'
+    __table_args__ = (
+        Index('ix_dashboard_assignee_name', 'assignee_name'),
+        # Server-side filters and sort orders of the dashboard list
+        Index('ix_dashboard_assignee_status', 'assignee_name', 'status', 'id'),
+        Index('ix_dashboard_assignee_hard_deadline', 'assignee_name', 'hard_deadline', 'id'),
+        Index('ix_dashboard_assignee_soft_deadline', 'assignee_name', 'soft_deadline', 'id'),
+        Index('ix_dashboard_assignee_created_at', 'assignee_name', 'created_at', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
     task_id = Column(Integer, ForeignKey('tasks.id'), unique=True, nullable=False)
@@ -96,6 +107,10 @@ class Dashboard(Base):
 
 class TaskDependency(Base):
     __tablename__ = 'task_dependencies'
+    __table_args__ = (
+        Index('ix_task_dependencies_parent_task_id', 'parent_task_id'),
+        Index('ix_task_dependencies_child_task_id', 'child_task_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     parent_task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
@@ -106,6 +121,50 @@ class TaskDependency(Base):
     parent_task = relationship('Task', foreign_keys=[parent_task_id], back_populates='child_tasks')
     child_task = relationship('Task', foreign_keys=[child_task_id], back_populates='parent_tasks')
 
+class TaskClosure(Base):
+    __tablename__ = 'task_closure'
+    __table_args__ = (
+        Index('ix_task_closure_ancestor_depth', 'ancestor_id', 'depth'),
+        Index('ix_task_closure_descendant_depth', 'descendant_id', 'depth'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    ancestor_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
+    descendant_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
+    depth = Column(Integer, nullable=False)  # 1 for direct children
+
+class TaskChange(Base):
+    __tablename__ = 'task_changes'
+    __table_args__ = (
+        # Newest graph write, checked by the SQL graph backend on every refresh
+        Index('ix_task_changes_kind_seq', 'kind', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(Integer, nullable=False)  # no foreign key: deletions are logged too
+    kind = Column(String(20), nullable=False)  # 'task', 'permission' or 'graph'
+    operation = Column(String(10), nullable=False)  # 'upsert' or 'delete'
+    user_id = Column(Integer)  # user whose permission changed
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+class TaskOutbox(Base):
+    __tablename__ = 'task_outbox'
+    __table_args__ = (
+        # Earlier events of a task hold back its later ones
+        Index('ix_task_outbox_task_id', 'task_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(30), nullable=False)  # 'graph_sync', 'graph_delete', 'attachments_delete'
+    task_id = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False)  # not retried before this time
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class TaskParallel(Base):
     __tablename__ = 'task_parallel'
 
@@ -120,6 +179,9 @@ class TaskParallel(Base):
 
 class TaskAssignee(Base):
     __tablename__ = 'task_assignees'
+    __table_args__ = (
+        Index('ix_task_assignees_user_id', 'user_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
@@ -185,6 +247,10 @@ class TaskHistory(Base):
 
 class TaskPermission(Base):
     __tablename__ = 'task_permissions'
+    __table_args__ = (
+        Index('uq_task_permissions_task_user', 'task_id', 'user_id', unique=True),
+        Index('ix_task_permissions_user_level', 'user_id', 'permission_level'),
+    )
 
     id = Column(Integer, primary_key=True)
     task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
@@ -197,13 +263,32 @@ class TaskPermission(Base):
     user = relationship('User', back_populates='permissions')
 
 # Database connection and table creation
-def init_db(database_url='sqlite:///tasks.db'):
+def init_db(database_url='sqlite:///tasks.db', reset=True, collapse_duplicates=False):
     engine = create_engine(database_url)
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+    else:
+        # Non-destructive: only add the tables and indexes that are missing
+        created, blocked = ensure_schema(engine, Base.metadata)
+        if blocked and collapse_duplicates:
+            deleted = collapse_duplicate_keys(engine, blocked, Base.metadata)
+            print(f"Deleted duplicate rows: {deleted}")
+            created_now, blocked = ensure_schema(engine, Base.metadata)
+            created += created_now
+        print(f"Created indexes: {', '.join(created) or 'none'}")
+        for name, duplicates in blocked.items():
+            print(f"Skipped unique index {name}: {duplicates} duplicated keys "
+                  f"(rerun with --collapse-duplicates to keep only the newest row of each)")
     return engine
 
 if __name__ == '__main__':
-    # Create tables when running this file directly
-    engine = init_db()
-    print("All tables have been created successfully!") 
\ No newline at end of file
+    # Create tables when running this file directly;
+    # pass --ensure-indexes to migrate a live database without dropping it,
+    # plus --collapse-duplicates to delete duplicate rows that block a unique index
+    if '--ensure-indexes' in sys.argv:
+        engine = init_db(reset=False, collapse_duplicates='--collapse-duplicates' in sys.argv)
+        print("Tables and indexes are up to date!")
+    else:
+        engine = init_db()
+        print("All tables have been created successfully!") 
\ No newline at end of file
@@ -0,0 +1,658 @@
+import logging
+import threading
+
+import sqlalchemy as sa
+
+from datetime import datetime
+
+from models import dashboard, task_changes, task_closure, task_dependencies
+
+logger = logging.getLogger(__name__)
+
+
+# Link the subtree rooted at :child_id under :parent_id and all of its ancestors
+_CLOSURE_LINK = sa.text("""
+    INSERT INTO task_closure (ancestor_id, descendant_id, depth)
+    SELECT a.ancestor_id, d.descendant_id, a.depth + d.depth + 1
+    FROM (
+        SELECT :parent_id AS ancestor_id, 0 AS depth
+        UNION ALL
+        SELECT ancestor_id, depth FROM task_closure WHERE descendant_id = :parent_id
+    ) AS a
+    CROSS JOIN (
+        SELECT :child_id AS descendant_id, 0 AS depth
+        UNION ALL
+        SELECT descendant_id, depth FROM task_closure WHERE ancestor_id = :child_id
+    ) AS d
+""")
+
+# Detach the subtree rooted at :task_id from every ancestor of :task_id
+_CLOSURE_UNLINK = sa.text("""
+    DELETE FROM task_closure
+    WHERE descendant_id IN (
+        SELECT descendant_id FROM (
+            SELECT :task_id AS descendant_id
+            UNION ALL
+            SELECT descendant_id FROM task_closure WHERE ancestor_id = :task_id
+        ) AS subtree
+    )
+    AND ancestor_id IN (
+        SELECT ancestor_id FROM (
+            SELECT ancestor_id FROM task_closure WHERE descendant_id = :task_id
+        ) AS ancestors
+    )
+""")
+
+
+def summarize_subtrees(rows):
+    """Fold (root_id, status, task_count, earliest_hard_deadline) rows into per-root rollups"""
+    rollups = {}
+    for root_id, status, task_count, earliest_hard_deadline in rows:
+        status = getattr(status, "value", status)
+        rollup = rollups.setdefault(
+            root_id, {"total": 0, "by_status": {}, "earliest_hard_deadline": None}
+        )
+        rollup["total"] += task_count
+        rollup["by_status"][status] = rollup["by_status"].get(status, 0) + task_count
+        if earliest_hard_deadline is not None and (
+            rollup["earliest_hard_deadline"] is None
+            or earliest_hard_deadline < rollup["earliest_hard_deadline"]
+        ):
+            rollup["earliest_hard_deadline"] = earliest_hard_deadline
+    for rollup in rollups.values():
+        rollup["done_ratio"] = rollup["by_status"].get("done", 0) / rollup["total"]
+        rollup["blocked"] = rollup["by_status"].get("blocked", 0)
+    return rollups
+
+
+class GraphBackend:
+    """Store of PARENT_OF relationships between tasks.
+
+    Nodes are identified by task_id; get_parent_task / get_child_tasks return
+    {"id": task_id, "title": title} dicts.
+    """
+
+    def create_task_node(self, task_id, title):
+        raise NotImplementedError
+
+    def create_task_relationship(self, child_id, parent_id):
+        raise NotImplementedError
+
+    def remove_task_relationships(self, task_id):
+        raise NotImplementedError
+
+    def delete_task_node(self, task_id):
+        raise NotImplementedError
+
+    def get_parent_task(self, task_id):
+        raise NotImplementedError
+
+    def get_child_tasks(self, task_id):
+        raise NotImplementedError
+
+    def check_circular_dependency(self, parent_id, child_id):
+        """True if making child_id a child of parent_id would close a cycle"""
+        raise NotImplementedError
+
+    def get_descendants(self, task_id):
+        """Whole subtree below task_id as [{"id", "title", "depth"}], nearest first"""
+        raise NotImplementedError
+
+    def get_ancestors(self, task_id):
+        """Chain of tasks above task_id as [{"id", "title", "depth"}], nearest first"""
+        raise NotImplementedError
+
+    def get_subtree_rollups(self, task_ids):
+        """Progress of every descendant of each task in task_ids.
+
+        Returns {task_id: {"total", "by_status", "done_ratio", "blocked",
+        "earliest_hard_deadline"}}; tasks without descendants are omitted.
+        """
+        raise NotImplementedError
+
+    def sync_tasks(self, tasks):
+        """Upsert (task_id, title, parent_id) nodes and re-point each at its parent in one transaction.
+
+        A parent_id of None leaves the task without a parent. A re-parent that would
+        close a cycle is rejected and the task keeps its current parent.
+        """
+        raise NotImplementedError
+
+    def export_tasks(self):
+        """Every node as (task_id, title, parent_id), the input sync_tasks() of another backend takes"""
+        raise NotImplementedError
+
+    def refresh(self):
+        """Pick up graph writes made by other processes; returns True if reads may now differ"""
+        return False
+
+    def get_hierarchy(self, task_ids):
+        """Parent and children of every task in task_ids as {task_id: {"parent", "children"}}"""
+        return {
+            task_id: {"parent": self.get_parent_task(task_id), "children": self.get_child_tasks(task_id)}
+            for task_id in task_ids
+        }
+
+
+class Neo4jGraphBackend(GraphBackend):
+    """Task graph kept in a remote Neo4j instance as (:Task)-[:PARENT_OF]->(:Task)"""
+
+    def __init__(self, uri, user, password, engine):
+        # Neo4j is optional, only needed when this backend is configured
+        from neo4j import GraphDatabase
+        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        # Task attributes (status, deadlines) stay in the SQL dashboard table
+        self.engine = engine
+
+    def create_task_node(self, task_id, title):
+        """Создает узел в Neo4j для задачи"""
+        with self.driver.session() as session:
+            session.run(
+                "MERGE (t:Task {task_id: $task_id}) "
+                "SET t.title = $title",
+                task_id=task_id, title=title
+            )
+
+    def create_task_relationship(self, child_id, parent_id):
+        """Создает отношение PARENT_OF между задачами"""
+        with self.driver.session() as session:
+            session.run(
+                "MATCH (parent:Task {task_id: $parent_id}) "
+                "MATCH (child:Task {task_id: $child_id}) "
+                "MERGE (parent)-[:PARENT_OF]->(child)",
+                parent_id=parent_id, child_id=child_id
+            )
+
+    def remove_task_relationships(self, task_id):
+        """Удаляет только те связи, где task_id является дочерним элементом"""
+        with self.driver.session() as session:
+            session.run(
+                "MATCH (parent:Task)-[r:PARENT_OF]->(child:Task {task_id: $task_id}) DELETE r",
+                task_id=task_id
+            )
+
+    def sync_tasks(self, tasks):
+        """Создает/обновляет узлы и связи с родителями в одной управляемой транзакции"""
+        rows = [
+            {"task_id": task_id, "title": title, "parent_id": parent_id}
+            for task_id, title, parent_id in tasks
+        ]
+        if not rows:
+            return
+
+        def write(tx):
+            # Nodes first, so parents created in the same batch can be matched below
+            tx.run(
+                "UNWIND $rows AS row "
+                "MERGE (t:Task {task_id: row.task_id}) "
+                "SET t.title = row.title",
+                rows=rows
+            ).consume()
+            # Rows whose new parent sits inside their own subtree are left as they are
+            rejected = tx.run(
+                "UNWIND $rows AS row "
+                "MATCH (t:Task {task_id: row.task_id}) "
+                "OPTIONAL MATCH (parent:Task {task_id: row.parent_id}) "
+                "WITH t, row, parent, "
+                "  parent IS NOT NULL AND EXISTS { MATCH (t)-[:PARENT_OF*0..]->(parent) } AS circular "
+                "CALL { "
+                "  WITH t, parent, circular "
+                "  WITH t, parent WHERE NOT circular "
+                "  OPTIONAL MATCH (:Task)-[old:PARENT_OF]->(t) "
+                "  DELETE old "
+                "  WITH DISTINCT t, parent "
+                "  FOREACH (_ IN CASE WHEN parent IS NULL THEN [] ELSE [1] END | "
+                "    MERGE (parent)-[:PARENT_OF]->(t)) "
+                "} "
+                "WITH row WHERE circular "
+                "RETURN row.task_id AS task_id, row.parent_id AS parent_id",
+                rows=rows
+            ).data()
+            for record in rejected:
+                logger.warning("Rejected re-parenting task %s under %s: it would close a cycle",
+                               record["task_id"], record["parent_id"])
+
+        with self.driver.session() as session:
+            session.execute_write(write)
+
+    def export_tasks(self):
+        """Выгружает все узлы с их родителями для переноса в другой бэкенд"""
+        with self.driver.session() as session:
+            result = session.run(
+                "MATCH (t:Task) "
+                "OPTIONAL MATCH (parent:Task)-[:PARENT_OF]->(t) "
+                "RETURN t.task_id AS task_id, t.title AS title, min(parent.task_id) AS parent_id"
+            )
+            return [(record["task_id"], record["title"], record["parent_id"]) for record in result]
+
+    def close(self):
+        self.driver.close()
+
+    def delete_task_node(self, task_id):
+        """Удаляет узел задачи из Neo4j"""
+        with self.driver.session() as session:
+            session.run(
+                "MATCH (t:Task {task_id: $task_id}) DETACH DELETE t",
+                task_id=task_id
+            )
+
+    def get_parent_task(self, task_id):
+        """Получает родительскую задачу"""
+        with self.driver.session() as session:
+            result = session.run(
+                "MATCH (parent:Task)-[:PARENT_OF]->(child:Task {task_id: $task_id}) "
+                "RETURN parent.task_id AS parent_id, parent.title AS parent_title",
+                task_id=task_id
+            )
+            record = result.single()
+            if record:
+                return {"id": record["parent_id"], "title": record["parent_title"]}
+            return None
+
+    def get_child_tasks(self, task_id):
+        """Получает все дочерние задачи"""
+        with self.driver.session() as session:
+            result = session.run(
+                "MATCH (parent:Task {task_id: $task_id})-[:PARENT_OF]->(child:Task) "
+                "RETURN child.task_id AS child_id, child.title AS child_title",
+                task_id=task_id
+            )
+            return [{"id": record["child_id"], "title": record["child_title"]} for record in result]
+
+    def get_hierarchy(self, task_ids):
+        """Получает родителя и дочерние задачи сразу для набора задач одним запросом"""
+        task_ids = list(task_ids)
+        if not task_ids:
+            return {}
+        with self.driver.session() as session:
+            result = session.run(
+                "UNWIND $task_ids AS task_id "
+                "OPTIONAL MATCH (t:Task {task_id: task_id}) "
+                "OPTIONAL MATCH (parent:Task)-[:PARENT_OF]->(t) "
+                "WITH task_id, t, head(collect(parent {id: parent.task_id, title: parent.title})) AS parent "
+                "OPTIONAL MATCH (t)-[:PARENT_OF]->(child:Task) "
+                "RETURN task_id, parent, collect(child {id: child.task_id, title: child.title}) AS children",
+                task_ids=task_ids
+            )
+            return {
+                record["task_id"]: {"parent": record["parent"], "children": record["children"]}
+                for record in result
+            }
+
+    def check_circular_dependency(self, parent_id, child_id):
+        """Проверяет, не возникнет ли циклическая зависимость"""
+        if parent_id == child_id:
+            return True
+        # Walk up from the new parent over incoming PARENT_OF edges only, so the
+        # traversal is bounded by the parent's ancestors instead of the whole graph
+        with self.driver.session() as session:
+            result = session.run(
+                "MATCH (parent:Task {task_id: $parent_id}) "
+                "RETURN EXISTS { "
+                "  MATCH (parent)<-[:PARENT_OF*]-(:Task {task_id: $child_id}) "
+                "} AS has_circular",
+                parent_id=parent_id, child_id=child_id
+            )
+            record = result.single()
+            return bool(record and record["has_circular"])
+
+    def get_descendants(self, task_id):
+        """Получает все задачи поддерева"""
+        with self.driver.session() as session:
+            result = session.run(
+                "MATCH path = (:Task {task_id: $task_id})-[:PARENT_OF*]->(d:Task) "
+                "RETURN d.task_id AS id, d.title AS title, length(path) AS depth "
+                "ORDER BY depth",
+                task_id=task_id
+            )
+            return [{"id": record["id"], "title": record["title"], "depth": record["depth"]} for record in result]
+
+    def get_subtree_rollups(self, task_ids):
+        """Собирает прогресс поддеревьев: связи из Neo4j, статусы из SQL"""
+        task_ids = list(task_ids)
+        if not task_ids:
+            return {}
+        with self.driver.session() as session:
+            result = session.run(
+                "UNWIND $task_ids AS task_id "
+                "MATCH (:Task {task_id: task_id})-[:PARENT_OF*]->(d:Task) "
+                "RETURN task_id, collect(DISTINCT d.task_id) AS descendant_ids",
+                task_ids=task_ids
+            )
+            descendants = {record["task_id"]: record["descendant_ids"] for record in result}
+        all_ids = {task_id for ids in descendants.values() for task_id in ids}
+        if not all_ids:
+            return {}
+
+        stmt = sa.select(dashboard.c.task_id, dashboard.c.status, dashboard.c.hard_deadline).where(
+            dashboard.c.task_id.in_(all_ids)
+        )
+        with self.engine.connect() as connection:
+            attributes = {row.task_id: row for row in connection.execute(stmt)}
+        rows = [
+            (root_id, attributes[task_id].status, 1, attributes[task_id].hard_deadline)
+            for root_id, ids in descendants.items()
+            for task_id in ids if task_id in attributes
+        ]
+        return summarize_subtrees(rows)
+
+    def get_ancestors(self, task_id):
+        """Получает всех предков задачи"""
+        with self.driver.session() as session:
+            result = session.run(
+                "MATCH path = (a:Task)-[:PARENT_OF*]->(:Task {task_id: $task_id}) "
+                "RETURN a.task_id AS id, a.title AS title, length(path) AS depth "
+                "ORDER BY depth",
+                task_id=task_id
+            )
+            return [{"id": record["id"], "title": record["title"], "depth": record["depth"]} for record in result]
+
+
+class SqlGraphBackend(GraphBackend):
+    """Task graph stored in the task_dependencies table, answered from an in-memory adjacency index.
+
+    The index is loaded from SQL on first use and updated write-through, so reads
+    never leave the process. Every write also appends a 'graph' entry to the
+    task_changes log, and refresh() reloads the index once the log shows writes it
+    has not seen, e.g. from another process. Call reload() after changing the
+    table by other means.
+
+    The task_closure table is maintained in the same transactions, so subtree and
+    ancestor queries are a single indexed lookup. Like the app, it assumes the
+    hierarchy is a forest: every task has at most one parent.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._seq = 0
+        self._titles = {}
+        self._parents = {}
+        self._children = {}
+
+    def reload(self):
+        with self._lock:
+            self._loaded = False
+            self._ensure_loaded()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            with self.engine.connect() as connection:
+                # Read the log position first: writes after it are picked up by the next refresh()
+                self._seq = connection.execute(self._latest_graph_change).scalar() or 0
+                titles = connection.execute(sa.select(dashboard.c.task_id, dashboard.c.title)).all()
+                edges = connection.execute(
+                    sa.select(task_dependencies.c.parent_task_id, task_dependencies.c.child_task_id)
+                ).all()
+            self._titles = dict(titles)
+            self._parents = {}
+            self._children = {}
+            for parent_id, child_id in edges:
+                self._link(child_id, parent_id)
+            self._loaded = True
+
+            # Backfill the closure table for graphs written before it existed
+            with self.engine.connect() as connection:
+                direct_links = connection.execute(
+                    sa.select(sa.func.count()).select_from(task_closure).where(task_closure.c.depth == 1)
+                ).scalar()
+            if direct_links != len(edges):
+                self.rebuild_closure()
+
+    _latest_graph_change = sa.select(sa.func.max(task_changes.c.seq)).where(task_changes.c.kind == "graph")
+
+    def refresh(self):
+        with self.engine.connect() as connection:
+            seq = connection.execute(self._latest_graph_change).scalar() or 0
+        with self._lock:
+            # The index's own writes have already moved self._seq along. Lower than
+            # before after a table reset, a pruned log or a rolled back write: reload as well
+            if not self._loaded or seq == self._seq:
+                return False
+            self._loaded = False
+            return True
+
+    def _log_changes(self, connection, task_ids, operation):
+        """Log a write made under the lock and move the index's log position past it.
+
+        The position only advances when no other writer logged since the index last
+        looked, so refresh() still reloads for foreign writes. Should the transaction
+        roll back, the position points past the log's end and refresh() reloads too.
+        """
+        previous = connection.execute(self._latest_graph_change).scalar() or 0
+        now = datetime.now()
+        connection.execute(task_changes.insert(), [
+            {"task_id": task_id, "kind": "graph", "operation": operation, "changed_at": now}
+            for task_id in task_ids
+        ])
+        if previous == self._seq:
+            self._seq = connection.execute(self._latest_graph_change).scalar() or 0
+
+    def rebuild_closure(self):
+        """Recompute task_closure from the adjacency index"""
+        with self._lock:
+            rows = []
+            for descendant_id in self._parents:
+                depth = 0
+                pending = set(self._parents.get(descendant_id, ()))
+                seen = set()
+                while pending:
+                    depth += 1
+                    for ancestor_id in pending:
+                        rows.append({"ancestor_id": ancestor_id, "descendant_id": descendant_id, "depth": depth})
+                    seen |= pending
+                    pending = {
+                        grand_id for ancestor_id in pending
+                        for grand_id in self._parents.get(ancestor_id, ()) if grand_id not in seen
+                    }
+            with self.engine.begin() as connection:
+                connection.execute(task_closure.delete())
+                if rows:
+                    connection.execute(task_closure.insert(), rows)
+
+    def _link(self, child_id, parent_id):
+        self._parents.setdefault(child_id, set()).add(parent_id)
+        self._children.setdefault(parent_id, set()).add(child_id)
+
+    def _unlink(self, child_id, parent_id):
+        self._parents.get(child_id, set()).discard(parent_id)
+        self._children.get(parent_id, set()).discard(child_id)
+
+    def _node(self, task_id):
+        return {"id": task_id, "title": self._titles.get(task_id)}
+
+    def create_task_node(self, task_id, title):
+        # Titles live in the dashboard table, only the index needs updating
+        self._ensure_loaded()
+        with self._lock:
+            self._titles[task_id] = title
+
+    def create_task_relationship(self, child_id, parent_id):
+        self._ensure_loaded()
+        with self._lock:
+            if child_id not in self._titles or parent_id not in self._titles:
+                return
+            if parent_id in self._parents.get(child_id, ()):
+                return
+            with self.engine.begin() as connection:
+                connection.execute(
+                    task_dependencies.insert().values(parent_task_id=parent_id, child_task_id=child_id)
+                )
+                connection.execute(_CLOSURE_LINK, {"parent_id": parent_id, "child_id": child_id})
+                self._log_changes(connection, [child_id], "upsert")
+            self._link(child_id, parent_id)
+
+    def sync_tasks(self, tasks):
+        self._ensure_loaded()
+        tasks = list(tasks)
+        with self._lock:
+            try:
+                with self.engine.begin() as connection:
+                    # Parents created in the same batch count as existing
+                    self._titles.update((task_id, title) for task_id, title, _ in tasks)
+                    # Apply each entry to the index before the next one, so a task listed
+                    # twice is compared against its parent as of the previous entry
+                    for task_id, _, parent_id in tasks:
+                        if parent_id not in self._titles:
+                            parent_id = None
+                        if parent_id is not None and self._reaches(parent_id, task_id):
+                            logger.warning("Rejected re-parenting task %s under %s: it would close a cycle",
+                                           task_id, parent_id)
+                            continue
+                        current = self._parents.get(task_id, set())
+                        if current == ({parent_id} if parent_id is not None else set()):
+                            continue
+                        connection.execute(
+                            task_dependencies.delete().where(task_dependencies.c.child_task_id == task_id)
+                        )
+                        connection.execute(_CLOSURE_UNLINK, {"task_id": task_id})
+                        for old_parent_id in list(current):
+                            self._unlink(task_id, old_parent_id)
+                        if parent_id is not None:
+                            connection.execute(
+                                task_dependencies.insert().values(parent_task_id=parent_id, child_task_id=task_id)
+                            )
+                            connection.execute(_CLOSURE_LINK, {"parent_id": parent_id, "child_id": task_id})
+                            self._link(task_id, parent_id)
+                    if tasks:
+                        self._log_changes(connection, sorted({task_id for task_id, _, _ in tasks}), "upsert")
+            except Exception:
+                # The index ran ahead of a transaction that was rolled back
+                self._loaded = False
+                raise
+
+    def remove_task_relationships(self, task_id):
+        self._ensure_loaded()
+        with self._lock:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    task_dependencies.delete().where(task_dependencies.c.child_task_id == task_id)
+                )
+                connection.execute(_CLOSURE_UNLINK, {"task_id": task_id})
+                self._log_changes(connection, [task_id], "upsert")
+            for parent_id in list(self._parents.get(task_id, ())):
+                self._unlink(task_id, parent_id)
+
+    def delete_task_node(self, task_id):
+        self._ensure_loaded()
+        with self._lock:
+            with self.engine.begin() as connection:
+                # Detach the children's subtrees first, then the task itself
+                for child_id in self._children.get(task_id, ()):
+                    connection.execute(_CLOSURE_UNLINK, {"task_id": child_id})
+                connection.execute(_CLOSURE_UNLINK, {"task_id": task_id})
+                connection.execute(
+                    task_dependencies.delete().where(
+                        sa.or_(
+                            task_dependencies.c.child_task_id == task_id,
+                            task_dependencies.c.parent_task_id == task_id,
+                        )
+                    )
+                )
+                self._log_changes(connection, [task_id], "delete")
+            for parent_id in list(self._parents.pop(task_id, ())):
+                self._children.get(parent_id, set()).discard(task_id)
+            for child_id in list(self._children.pop(task_id, ())):
+                self._parents.get(child_id, set()).discard(task_id)
+            self._titles.pop(task_id, None)
+
+    def export_tasks(self):
+        self._ensure_loaded()
+        with self._lock:
+            return [
+                (task_id, title, min(self._parents[task_id]) if self._parents.get(task_id) else None)
+                for task_id, title in self._titles.items()
+            ]
+
+    def get_parent_task(self, task_id):
+        self._ensure_loaded()
+        with self._lock:
+            parents = self._parents.get(task_id)
+            return self._node(min(parents)) if parents else None
+
+    def get_child_tasks(self, task_id):
+        self._ensure_loaded()
+        with self._lock:
+            return [self._node(child_id) for child_id in sorted(self._children.get(task_id, ()))]
+
+    def get_hierarchy(self, task_ids):
+        self._ensure_loaded()
+        with self._lock:
+            return {
+                task_id: {"parent": self.get_parent_task(task_id), "children": self.get_child_tasks(task_id)}
+                for task_id in task_ids
+            }
+
+    def check_circular_dependency(self, parent_id, child_id):
+        """True if child_id is parent_id itself or one of its ancestors.
+
+        Only the parent pointers above parent_id are visited, so the cost is the
+        depth of the new parent, not the size of the tree being moved.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            return self._reaches(parent_id, child_id)
+
+    def _reaches(self, task_id, ancestor_id):
+        """True if ancestor_id is task_id or above it; caller holds the lock"""
+        seen = set()
+        pending = [task_id]
+        while pending:
+            task_id = pending.pop()
+            if task_id == ancestor_id:
+                return True
+            if task_id in seen:
+                continue
+            seen.add(task_id)
+            pending.extend(self._parents.get(task_id, ()))
+        return False
+
+    def get_descendants(self, task_id):
+        self._ensure_loaded()
+        stmt = (
+            sa.select(task_closure.c.descendant_id, task_closure.c.depth)
+            .where(task_closure.c.ancestor_id == task_id)
+            .order_by(task_closure.c.depth)
+        )
+        with self.engine.connect() as connection:
+            rows = connection.execute(stmt).all()
+        with self._lock:
+            return [{**self._node(descendant_id), "depth": depth} for descendant_id, depth in rows]
+
+    def get_ancestors(self, task_id):
+        self._ensure_loaded()
+        stmt = (
+            sa.select(task_closure.c.ancestor_id, task_closure.c.depth)
+            .where(task_closure.c.descendant_id == task_id)
+            .order_by(task_closure.c.depth)
+        )
+        with self.engine.connect() as connection:
+            rows = connection.execute(stmt).all()
+        with self._lock:
+            return [{**self._node(ancestor_id), "depth": depth} for ancestor_id, depth in rows]
+
+    def get_subtree_rollups(self, task_ids):
+        """One aggregate over the closure join, grouped by subtree root and status"""
+        task_ids = list(task_ids)
+        if not task_ids:
+            return {}
+        self._ensure_loaded()
+        stmt = (
+            sa.select(
+                task_closure.c.ancestor_id,
+                dashboard.c.status,
+                sa.func.count(),
+                sa.func.min(dashboard.c.hard_deadline),
+            )
+            .join(dashboard, dashboard.c.task_id == task_closure.c.descendant_id)
+            .where(task_closure.c.ancestor_id.in_(task_ids))
+            .group_by(task_closure.c.ancestor_id, dashboard.c.status)
+        )
+        with self.engine.connect() as connection:
+            rows = connection.execute(stmt).all()
+        return summarize_subtrees(rows)
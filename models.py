@@ -1,7 +1,7 @@
 from datetime import datetime
 from sqlalchemy import (
     Column, Integer, String, DateTime, ForeignKey, Table,
-    Boolean, Text, Enum, MetaData, Float
+    Boolean, Text, Enum, MetaData, Float, Index, inspect, text
 )
 from sqlalchemy.orm import relationship
 import enum
@@ -57,7 +57,13 @@ dashboard = Table(
     Column('created_at', DateTime, nullable=False),
     Column('status', Enum(TaskStatus), nullable=False),
     Column('soft_deadline', DateTime),
-    Column('hard_deadline', DateTime)
+    Column('hard_deadline', DateTime),
+    Index('ix_dashboard_assignee_name', 'assignee_name'),
+    # Server-side filters and sort orders of the dashboard list
+    Index('ix_dashboard_assignee_status', 'assignee_name', 'status', 'id'),
+    Index('ix_dashboard_assignee_hard_deadline', 'assignee_name', 'hard_deadline', 'id'),
+    Index('ix_dashboard_assignee_soft_deadline', 'assignee_name', 'soft_deadline', 'id'),
+    Index('ix_dashboard_assignee_created_at', 'assignee_name', 'created_at', 'id'),
 )
 
 # Task dependencies (parent-child relationships)
@@ -68,6 +74,54 @@ task_dependencies = Table(
     Column('parent_task_id', Integer, ForeignKey('tasks.id'), nullable=False),
     Column('child_task_id', Integer, ForeignKey('tasks.id'), nullable=False),
     Column('created_at', DateTime, default=datetime.utcnow),
+    Index('ix_task_dependencies_parent_task_id', 'parent_task_id'),
+    Index('ix_task_dependencies_child_task_id', 'child_task_id'),
+)
+
+# Transitive closure of task_dependencies: one row per (ancestor, descendant) pair,
+# depth 1 for direct children. Maintained by the SQL graph backend.
+task_closure = Table(
+    'task_closure',
+    metadata_obj,
+    Column('id', Integer, primary_key=True),
+    Column('ancestor_id', Integer, ForeignKey('tasks.id'), nullable=False),
+    Column('descendant_id', Integer, ForeignKey('tasks.id'), nullable=False),
+    Column('depth', Integer, nullable=False),
+    Index('ix_task_closure_ancestor_depth', 'ancestor_id', 'depth'),
+    Index('ix_task_closure_descendant_depth', 'descendant_id', 'depth'),
+)
+
+# Append-only change log of dashboard and task_permissions; seq orders every change
+task_changes = Table(
+    'task_changes',
+    metadata_obj,
+    Column('seq', Integer, primary_key=True, autoincrement=True),
+    Column('task_id', Integer, nullable=False),
+    Column('kind', String(20), nullable=False),  # 'task', 'permission' or 'graph'
+    Column('operation', String(10), nullable=False),  # 'upsert' or 'delete'
+    Column('user_id', Integer),  # user whose permission changed
+    Column('changed_at', DateTime, default=datetime.utcnow),
+    # Newest graph write, checked by the SQL graph backend on every refresh
+    Index('ix_task_changes_kind_seq', 'kind', 'seq'),
+    sqlite_autoincrement=True,
+)
+
+# Side effects of task writes on the graph and document stores, committed with the write
+# and delivered afterwards by the outbox worker
+task_outbox = Table(
+    'task_outbox',
+    metadata_obj,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('kind', String(30), nullable=False),
+    Column('task_id', Integer, nullable=False),
+    Column('payload', Text, nullable=False),  # JSON
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('available_at', DateTime, nullable=False),
+    Column('last_error', Text),
+    Column('created_at', DateTime, default=datetime.utcnow),
+    # Earlier events of a task hold back its later ones
+    Index('ix_task_outbox_task_id', 'task_id', 'id'),
+    sqlite_autoincrement=True,
 )
 
 # Parallel tasks
@@ -89,6 +143,7 @@ task_assignees = Table(
     Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
     Column('assigned_at', DateTime, default=datetime.utcnow),
     Column('is_primary', Boolean, default=False),
+    Index('ix_task_assignees_user_id', 'user_id'),
 )
 
 # Custom fields definitions
@@ -145,4 +200,74 @@ task_permissions = Table(
     Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
     Column('permission_level', String(20), nullable=False),  # 'owner', 'edit', 'read', 'none'
     Column('created_at', DateTime, default=datetime.utcnow),
-) 
+    # One row per (task, user); bulk permission upserts conflict on this key
+    Index('uq_task_permissions_task_user', 'task_id', 'user_id', unique=True),
+    Index('ix_task_permissions_user_level', 'user_id', 'permission_level'),
+)
+
+
+def _unique_key(index):
+    return ', '.join(column.name for column in index.columns)
+
+
+def count_duplicate_keys(engine, index):
+    """Number of key values of a unique index that already occur in more than one row"""
+    with engine.connect() as connection:
+        return connection.execute(text(f"""
+            SELECT count(*) FROM (
+                SELECT 1 FROM {index.table.name}
+                GROUP BY {_unique_key(index)}
+                HAVING count(*) > 1
+            ) AS duplicated
+        """)).scalar()
+
+
+def ensure_schema(engine, metadata=metadata_obj):
+    """Create missing tables and indexes on a live database without dropping or deleting anything.
+
+    A unique index whose key is already duplicated in the table is not built.
+    Returns (created, blocked): the names of the indexes that were created and
+    {index name: number of duplicated keys} for the unique indexes left out.
+    Duplicates are only removed on request, by collapse_duplicate_keys().
+    """
+    metadata.create_all(engine, checkfirst=True)
+
+    inspector = inspect(engine)
+    created = []
+    blocked = {}
+    for table in metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                duplicates = count_duplicate_keys(engine, index)
+                if duplicates:
+                    blocked[index.name] = duplicates
+                    continue
+            index.create(engine)
+            created.append(index.name)
+    return created, blocked
+
+
+def collapse_duplicate_keys(engine, index_names, metadata=metadata_obj):
+    """Delete all but the newest row of every duplicated key of the named unique indexes.
+
+    Destructive: meant for an explicit admin action after ensure_schema() reported
+    the indexes as blocked. Returns {index name: number of rows deleted}.
+    """
+    deleted = {}
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            if not index.unique or index.name not in index_names:
+                continue
+            with engine.begin() as connection:
+                deleted[index.name] = connection.execute(text(f"""
+                    DELETE FROM {table.name}
+                    WHERE id NOT IN (
+                        SELECT max_id FROM (
+                            SELECT MAX(id) AS max_id FROM {table.name} GROUP BY {_unique_key(index)}
+                        ) AS newest
+                    )
+                """)).rowcount
+    return deleted
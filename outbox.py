@@ -0,0 +1,218 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_POLL_INTERVAL = 2.0  # seconds
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_MAX_BACKOFF = 300  # seconds
+
+_ENQUEUE = sa.text("""
+    INSERT INTO task_outbox (kind, task_id, payload, attempts, available_at, created_at)
+    VALUES (:kind, :task_id, :payload, 0, :now, :now)
+""")
+
+
+def enqueue(session, events):
+    """Add (kind, task_id, payload) side effects to the outbox within the caller's transaction"""
+    if not events:
+        return
+    now = datetime.now()
+    session.execute(_ENQUEUE, [
+        {"kind": kind, "task_id": task_id, "payload": json.dumps(payload), "now": now}
+        for kind, task_id, payload in events
+    ])
+
+
+def pending_events(engine, kinds):
+    """Undelivered (task_id, kind, payload) events of the given kinds, oldest first, failed ones included"""
+    stmt = sa.text("""
+        SELECT task_id, kind, payload FROM task_outbox
+        WHERE kind IN :kinds
+        ORDER BY id
+    """).bindparams(sa.bindparam("kinds", expanding=True))
+    with engine.connect() as connection:
+        rows = connection.execute(stmt, {"kinds": list(kinds)}).all()
+    return [(row.task_id, row.kind, json.loads(row.payload)) for row in rows]
+
+
+class OutboxWorker:
+    """Background thread that drains task_outbox into the graph and document stores.
+
+    handlers maps an event kind to a callable taking the list of payloads of a run of
+    consecutive events of that kind, so each store gets them as one batch. Delivered
+    events are deleted; failed ones are retried with exponential backoff. Events of a
+    task whose earlier event is still waiting, or has run out of attempts, are held
+    back, keeping per-task order. Handlers must be idempotent: a batch may be
+    redelivered after a crash, or by the worker of another process.
+
+    supersedes maps an event kind to the kinds it makes obsolete when it comes later
+    for the same task; retry_dead() discards such obsolete events instead of replaying.
+    """
+
+    def __init__(self, engine, handlers, batch_size=OUTBOX_BATCH_SIZE, poll_interval=OUTBOX_POLL_INTERVAL,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS, on_delivered=None, supersedes=None):
+        self.engine = engine
+        self.handlers = handlers
+        self.supersedes = supersedes or {}
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.on_delivered = on_delivered
+        self.delivered = 0
+        self.failed = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="task-outbox", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def wake(self):
+        """Drain now rather than at the next poll, e.g. right after a commit"""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        stmt = sa.text("""
+            SELECT
+                count(*) AS pending,
+                coalesce(sum(CASE WHEN attempts >= :max_attempts THEN 1 ELSE 0 END), 0) AS dead
+            FROM task_outbox
+        """)
+        with self.engine.connect() as connection:
+            row = connection.execute(stmt, {"max_attempts": self.max_attempts}).one()
+        return {
+            "pending": row.pending - row.dead,
+            "dead": row.dead,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "alive": self._thread.is_alive(),
+        }
+
+    def retry_dead(self):
+        """Give events that ran out of attempts another round; returns how many.
+
+        Dead events superseded by a later event of their task are dropped instead.
+        """
+        discard = sa.text("""
+            DELETE FROM task_outbox
+            WHERE attempts >= :max_attempts AND kind = :kind
+            AND EXISTS (
+                SELECT 1 FROM (
+                    SELECT id, task_id FROM task_outbox WHERE kind IN :later_kinds
+                ) AS later
+                WHERE later.task_id = task_outbox.task_id AND later.id > task_outbox.id
+            )
+        """).bindparams(sa.bindparam("later_kinds", expanding=True))
+        revive = sa.text("""
+            UPDATE task_outbox SET attempts = 0, available_at = :now
+            WHERE attempts >= :max_attempts
+        """)
+        superseded_by = {}
+        for later_kind, kinds in self.supersedes.items():
+            for kind in kinds:
+                superseded_by.setdefault(kind, set()).add(later_kind)
+        with self.engine.begin() as connection:
+            for kind, later_kinds in superseded_by.items():
+                connection.execute(discard, {
+                    "max_attempts": self.max_attempts, "kind": kind, "later_kinds": sorted(later_kinds),
+                })
+            count = connection.execute(revive, {"now": datetime.now(), "max_attempts": self.max_attempts}).rowcount
+        self.wake()
+        return count
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                drained = self.drain()
+            except Exception:
+                logger.exception("Outbox drain failed")
+                drained = 0
+            # A full batch means more may be waiting
+            if drained < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def drain(self):
+        """Deliver one batch of due events; returns the number of events looked at"""
+        # Due events whose task has no earlier event waiting for a retry or out of attempts
+        stmt = sa.text("""
+            SELECT o.id, o.kind, o.task_id, o.payload, o.attempts
+            FROM task_outbox AS o
+            WHERE o.attempts < :max_attempts AND o.available_at <= :now
+            AND NOT EXISTS (
+                SELECT 1 FROM task_outbox AS held
+                WHERE held.task_id = o.task_id AND held.id < o.id
+                AND (held.attempts >= :max_attempts OR held.available_at > :now)
+            )
+            ORDER BY o.id
+            LIMIT :limit
+        """)
+        with self.engine.connect() as connection:
+            rows = connection.execute(stmt, {
+                "max_attempts": self.max_attempts, "now": datetime.now(), "limit": self.batch_size,
+            }).all()
+        if not rows:
+            return 0
+
+        # Split into runs of consecutive events of one kind
+        held_tasks = set()
+        runs = []
+        for row in rows:
+            if runs and runs[-1][0] == row.kind:
+                runs[-1][1].append(row)
+            else:
+                runs.append((row.kind, [row]))
+
+        for kind, run in runs:
+            run = [row for row in run if row.task_id not in held_tasks]
+            if not run:
+                continue
+            try:
+                handler = self.handlers[kind]
+                handler([json.loads(row.payload) for row in run])
+            except Exception as e:
+                logger.warning("Outbox delivery of %d %s event(s) failed: %s", len(run), kind, e)
+                self._retry_later(run, e)
+                held_tasks.update(row.task_id for row in run)
+                continue
+            self._acknowledge(run)
+        return len(rows)
+
+    def _acknowledge(self, rows):
+        stmt = sa.text("DELETE FROM task_outbox WHERE id IN :ids").bindparams(sa.bindparam("ids", expanding=True))
+        with self.engine.begin() as connection:
+            connection.execute(stmt, {"ids": [row.id for row in rows]})
+        self.delivered += len(rows)
+        if self.on_delivered:
+            self.on_delivered({row.kind for row in rows})
+
+    def _retry_later(self, rows, error):
+        stmt = sa.text("""
+            UPDATE task_outbox
+            SET attempts = :attempts, available_at = :available_at, last_error = :last_error
+            WHERE id = :id
+        """)
+        now = datetime.now()
+        with self.engine.begin() as connection:
+            connection.execute(stmt, [
+                {
+                    "id": row.id,
+                    "attempts": row.attempts + 1,
+                    "available_at": now + timedelta(seconds=min(2 ** row.attempts, OUTBOX_MAX_BACKOFF)),
+                    "last_error": str(error)[:1000],
+                }
+                for row in rows
+            ])
+        self.failed += len(rows)
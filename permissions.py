@@ -0,0 +1,63 @@
+import sqlalchemy as sa
+
+# Backs the upsert; ensure_schema leaves it out while duplicate rows exist
+PERMISSION_UNIQUE_INDEX = "uq_task_permissions_task_user"
+
+_INSERT = """
+    INSERT INTO task_permissions
+    (task_id, user_id, permission_level, created_at)
+    VALUES (:task_id, :user_id, :permission_level, :created_at)
+"""
+
+_DELETE = sa.text("""
+    DELETE FROM task_permissions
+    WHERE task_id = :task_id AND user_id IN :user_ids
+""").bindparams(sa.bindparam("user_ids", expanding=True))
+
+
+def permission_upsert_stmt(dialect_name):
+    """INSERT that updates the level when the (task_id, user_id) row already exists"""
+    if dialect_name == "mysql":
+        conflict_clause = "ON DUPLICATE KEY UPDATE permission_level = VALUES(permission_level)"
+    else:
+        # SQLite and PostgreSQL share the same upsert syntax
+        conflict_clause = (
+            "ON CONFLICT (task_id, user_id) "
+            "DO UPDATE SET permission_level = excluded.permission_level"
+        )
+    return sa.text(_INSERT + conflict_clause)
+
+
+def insert_permissions(session, rows):
+    """Add permission rows of a task that has none yet, e.g. one created in the same transaction"""
+    if rows:
+        session.execute(sa.text(_INSERT), rows)
+
+
+def revoke_permissions(session, task_id, user_ids):
+    """Delete the rows of the given users on a task, duplicates included"""
+    if user_ids:
+        session.execute(_DELETE, {"task_id": task_id, "user_ids": list(user_ids)})
+
+
+def upsert_permissions(session, task_id, rows, dialect_name, unique_index=True):
+    """Write (task_id, user_id) rows of one task, replacing the stored levels.
+
+    Without the unique index (duplicate rows kept it from being created) the upsert
+    has no constraint to conflict on, so the users' rows are deleted and reinserted.
+    """
+    if not rows:
+        return
+    if unique_index:
+        session.execute(permission_upsert_stmt(dialect_name), rows)
+    else:
+        revoke_permissions(session, task_id, [row["user_id"] for row in rows])
+        insert_permissions(session, rows)
+
+
+def has_unique_index(engine):
+    """True if task_permissions has the unique (task_id, user_id) index the upsert needs"""
+    return any(
+        index["name"] == PERMISSION_UNIQUE_INDEX
+        for index in sa.inspect(engine).get_indexes("task_permissions")
+    )
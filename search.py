@@ -0,0 +1,171 @@
+import re
+
+import sqlalchemy as sa
+
+
+# Words of a search box entry; everything else (quotes, operators) is dropped before it reaches the engine
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class TaskSearchIndex:
+    """Full-text index over dashboard titles and descriptions.
+
+    Callers filter with match_clause(), which expects a :search_query parameter
+    holding the value returned by prepare_query().
+    """
+
+    name = None
+
+    def __init__(self, engine, table_name="dashboard"):
+        self.engine = engine
+        self.table_name = table_name
+
+    def ensure(self):
+        """Create the index if it is missing; returns True if anything was built"""
+        return False
+
+    def index_task(self, session, task_id, title, description):
+        """Add or refresh one task inside the caller's transaction"""
+
+    def remove_task(self, session, task_id):
+        """Drop one task inside the caller's transaction"""
+
+    def match_clause(self, alias="d"):
+        raise NotImplementedError
+
+    def prepare_query(self, text):
+        """Engine query for the words of text, or None if it has no searchable words"""
+        raise NotImplementedError
+
+    @staticmethod
+    def _words(text):
+        return _WORD.findall(text or "")
+
+
+class SqliteSearchIndex(TaskSearchIndex):
+    """FTS5 virtual table keyed by task_id, maintained by the task callbacks"""
+
+    name = "fts5"
+
+    @property
+    def fts_table(self):
+        return f"{self.table_name}_fts"
+
+    def ensure(self):
+        with self.engine.begin() as connection:
+            connection.execute(sa.text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} "
+                f"USING fts5(title, description, tokenize='unicode61')"
+            ))
+            indexed = connection.execute(sa.text(f"SELECT count(*) FROM {self.fts_table}")).scalar()
+            total = connection.execute(sa.text(f"SELECT count(*) FROM {self.table_name}")).scalar()
+            if indexed == total:
+                return False
+            # New, or out of step after a table reset: rebuild from the dashboard rows
+            connection.execute(sa.text(f"DELETE FROM {self.fts_table}"))
+            connection.execute(sa.text(
+                f"INSERT INTO {self.fts_table} (rowid, title, description) "
+                f"SELECT task_id, title, coalesce(description, '') FROM {self.table_name}"
+            ))
+            return True
+
+    def index_task(self, session, task_id, title, description):
+        self.remove_task(session, task_id)
+        session.execute(
+            sa.text(f"INSERT INTO {self.fts_table} (rowid, title, description) VALUES (:task_id, :title, :description)"),
+            {"task_id": task_id, "title": title, "description": description or ""},
+        )
+
+    def remove_task(self, session, task_id):
+        session.execute(sa.text(f"DELETE FROM {self.fts_table} WHERE rowid = :task_id"), {"task_id": task_id})
+
+    def match_clause(self, alias="d"):
+        return f"{alias}.task_id IN (SELECT rowid FROM {self.fts_table} WHERE {self.fts_table} MATCH :search_query)"
+
+    def prepare_query(self, text):
+        words = self._words(text)
+        if not words:
+            return None
+        # Every word must match, each as a prefix
+        return " ".join(f'"{word}"*' for word in words)
+
+
+class PostgresSearchIndex(TaskSearchIndex):
+    """GIN expression index; PostgreSQL keeps it current on every write to dashboard"""
+
+    name = "gin"
+    index_name = "ix_dashboard_search"
+    # 'simple' configuration: no stemming, so titles in any language are matched the same way
+    document = "to_tsvector('simple', coalesce({alias}.title, '') || ' ' || coalesce({alias}.description, ''))"
+
+    def ensure(self):
+        if any(index["name"] == self.index_name for index in sa.inspect(self.engine).get_indexes(self.table_name)):
+            return False
+        with self.engine.begin() as connection:
+            connection.execute(sa.text(
+                f"CREATE INDEX IF NOT EXISTS {self.index_name} ON {self.table_name} "
+                f"USING GIN ({self.document.format(alias=self.table_name)})"
+            ))
+        return True
+
+    def match_clause(self, alias="d"):
+        return f"{self.document.format(alias=alias)} @@ to_tsquery('simple', :search_query)"
+
+    def prepare_query(self, text):
+        words = self._words(text)
+        if not words:
+            return None
+        return " & ".join(f"{word}:*" for word in words)
+
+
+class MySqlSearchIndex(TaskSearchIndex):
+    """InnoDB FULLTEXT index; MySQL keeps it current on every write to dashboard"""
+
+    name = "fulltext"
+    index_name = "ix_dashboard_search"
+
+    def ensure(self):
+        if any(index["name"] == self.index_name for index in sa.inspect(self.engine).get_indexes(self.table_name)):
+            return False
+        with self.engine.begin() as connection:
+            connection.execute(sa.text(
+                f"CREATE FULLTEXT INDEX {self.index_name} ON {self.table_name} (title, description)"
+            ))
+        return True
+
+    def match_clause(self, alias="d"):
+        return f"MATCH ({alias}.title, {alias}.description) AGAINST (:search_query IN BOOLEAN MODE)"
+
+    def prepare_query(self, text):
+        words = self._words(text)
+        if not words:
+            return None
+        return " ".join(f"+{word}*" for word in words)
+
+
+class LikeSearchIndex(TaskSearchIndex):
+    """Unindexed LIKE scan for engines without a full-text equivalent wired up here"""
+
+    name = "like"
+
+    def match_clause(self, alias="d"):
+        return f"({alias}.title LIKE :search_query OR {alias}.description LIKE :search_query)"
+
+    def prepare_query(self, text):
+        words = self._words(text)
+        if not words:
+            return None
+        return "%" + "%".join(words) + "%"
+
+
+SEARCH_INDEXES = {
+    "sqlite": SqliteSearchIndex,
+    "postgresql": PostgresSearchIndex,
+    "mysql": MySqlSearchIndex,
+    "mariadb": MySqlSearchIndex,
+}
+
+
+def search_index_for(engine, table_name="dashboard"):
+    """Full-text index implementation matching the engine's dialect"""
+    return SEARCH_INDEXES.get(engine.dialect.name, LikeSearchIndex)(engine, table_name)
@@ -0,0 +1,50 @@
+import importlib
+
+import caches
+
+
+def test_query_cache_miss_survives_module_reload():
+    cache = caches.QueryCache()
+    versions = cache.versions(("dashboard",))
+    cache.put("page", ("dashboard",), versions, {1: "task"})
+
+    # Streamlit re-executes the app on every rerun while the cache object lives on
+    reloaded = importlib.reload(caches)
+
+    # A sentinel taken from the fresh module would no longer match the cache's own
+    assert reloaded.LruCache.MISS is not cache.MISS
+    assert cache.get("page") == {1: "task"}
+    cache.bump("dashboard")
+    assert cache.get("page") is cache.MISS
+
+
+def test_query_cache_skips_put_after_concurrent_bump():
+    cache = caches.QueryCache()
+    versions = cache.versions(("dashboard",))
+    cache.bump("dashboard")
+    cache.put("page", ("dashboard",), versions, [1])
+    assert cache.get("page") is cache.MISS
+
+
+def test_permission_cache_skips_put_after_invalidate():
+    cache = caches.PermissionCache()
+    versions = cache.versions(1, 2)
+    cache.invalidate(1, 2)
+    cache.put(1, 2, "edit", versions)
+    assert cache.get(1, 2) is None
+
+    versions = cache.versions(1, 2)
+    cache.put(1, 2, "edit", versions)
+    assert cache.get(1, 2) == "edit"
+    cache.invalidate_task(1)
+    assert cache.get(1, 2) is None
+
+
+def test_permission_cache_evicts_least_recently_used():
+    cache = caches.PermissionCache(maxsize=2)
+    cache.put(1, 1, "owner")
+    cache.put(1, 2, "read")
+    cache.get(1, 1)
+    cache.put(2, 1, "edit")
+    assert cache.get(1, 2) is None
+    assert cache.get(1, 1) == "owner"
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+import sqlalchemy as sa
+
+import models
+from graph import SqlGraphBackend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'todo.db'}")
+    models.metadata_obj.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(models.dashboard.insert(), [
+            {"task_id": task_id, "title": f"Task {task_id}", "created_at": datetime.now(),
+             "status": models.TaskStatus.todo}
+            for task_id in (1, 2, 3)
+        ])
+    yield SqlGraphBackend(engine)
+    engine.dispose()
+
+
+def test_own_writes_do_not_trigger_reload(backend):
+    backend.create_task_relationship(2, 1)
+    backend.sync_tasks([(3, "Task 3", 2)])
+    backend.remove_task_relationships(3)
+    assert backend.refresh() is False
+    assert backend.get_parent_task(2)["id"] == 1
+
+
+def test_foreign_write_triggers_reload(backend):
+    backend.create_task_relationship(2, 1)
+    other = SqlGraphBackend(backend.engine)
+    other.create_task_relationship(3, 2)
+
+    # A local write logged after the other process's one must not hide it
+    backend.remove_task_relationships(2)
+    assert backend.refresh() is True
+    assert [task["id"] for task in backend.get_ancestors(3)] == [2]
+    assert backend.refresh() is False
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+import models
+from permissions import (
+    PERMISSION_UNIQUE_INDEX, has_unique_index, insert_permissions, upsert_permissions,
+)
+
+
+@pytest.fixture
+def engine_with_duplicates(tmp_path):
+    """Database whose duplicated permission rows keep the unique index from being built"""
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'todo.db'}")
+    models.metadata_obj.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(sa.text(f"DROP INDEX {PERMISSION_UNIQUE_INDEX}"))
+        connection.execute(models.task_permissions.insert(), [
+            {"task_id": 1, "user_id": 2, "permission_level": "read", "created_at": datetime(2024, 1, 1)},
+            {"task_id": 1, "user_id": 2, "permission_level": "edit", "created_at": datetime(2024, 1, 2)},
+            {"task_id": 1, "user_id": 3, "permission_level": "read", "created_at": datetime(2024, 1, 1)},
+        ])
+    yield engine
+    engine.dispose()
+
+
+def _levels(engine, task_id):
+    with engine.connect() as connection:
+        rows = connection.execute(sa.text(
+            "SELECT user_id, permission_level FROM task_permissions WHERE task_id = :task_id"
+        ), {"task_id": task_id})
+        return sorted(tuple(row) for row in rows)
+
+
+def _row(task_id, user_id, level):
+    return {"task_id": task_id, "user_id": user_id, "permission_level": level, "created_at": datetime.now()}
+
+
+def test_schema_reports_blocked_permission_index(engine_with_duplicates):
+    _, blocked = models.ensure_schema(engine_with_duplicates)
+    assert blocked == {PERMISSION_UNIQUE_INDEX: 1}
+    assert not has_unique_index(engine_with_duplicates)
+
+
+def test_upsert_without_unique_index_replaces_duplicates(engine_with_duplicates):
+    models.ensure_schema(engine_with_duplicates)
+    with Session(engine_with_duplicates) as session:
+        # ON CONFLICT has no constraint to match while the index is missing
+        with pytest.raises(sa.exc.OperationalError):
+            upsert_permissions(session, 1, [_row(1, 2, "owner")], "sqlite")
+        session.rollback()
+
+        upsert_permissions(session, 1, [_row(1, 2, "owner")], "sqlite", unique_index=False)
+        session.commit()
+    assert _levels(engine_with_duplicates, 1) == [(2, "owner"), (3, "read")]
+
+
+def test_new_task_rows_insert_without_unique_index(engine_with_duplicates):
+    models.ensure_schema(engine_with_duplicates)
+    with Session(engine_with_duplicates) as session:
+        insert_permissions(session, [_row(5, 2, "owner"), _row(5, 3, "read")])
+        session.commit()
+    assert _levels(engine_with_duplicates, 5) == [(2, "owner"), (3, "read")]
+
+
+def test_upsert_after_collapsing_duplicates(engine_with_duplicates):
+    _, blocked = models.ensure_schema(engine_with_duplicates)
+    models.collapse_duplicate_keys(engine_with_duplicates, blocked)
+    models.ensure_schema(engine_with_duplicates)
+    assert has_unique_index(engine_with_duplicates)
+    assert _levels(engine_with_duplicates, 1) == [(2, "edit"), (3, "read")]
+
+    with Session(engine_with_duplicates) as session:
+        upsert_permissions(session, 1, [_row(1, 2, "read"), _row(1, 4, "edit")], "sqlite")
+        session.commit()
+    assert _levels(engine_with_duplicates, 1) == [(2, "read"), (3, "read"), (4, "edit")]